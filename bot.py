@@ -1,195 +1,599 @@
-import os
-import re
-import json
-import shutil
-import asyncio
-import logging
-from pathlib import Path
-from telegram import Update
-from telegram.constants import ParseMode
-from telegram.ext import ApplicationBuilder, ContextTypes, MessageHandler, filters, CommandHandler
-from telegram.error import TelegramError
-
-# ============================ CONFIGURATION ============================
-BOT_TOKEN = os.getenv("BOT_TOKEN")
-TARGET_CHANNEL_ID = os.getenv("TARGET_CHANNEL_ID")
-try:
-    ALLOWED_USER_ID = int(os.getenv("ALLOWED_USER_ID"))
-except (ValueError, TypeError):
-    ALLOWED_USER_ID = None
-
-TELEGRAM_CAPTION_LIMIT = 1024
-MAX_FILE_SIZE_MB = 50
-MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
-# =======================================================================
-
-# --- Logging ---
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
-logger = logging.getLogger(__name__)
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.getLogger("telegram.ext").setLevel(logging.WARNING)
-
-# --- Regex for Instagram shortcode ---
-SHORTCODE_RE = re.compile(
-    r"(?:https?://)?(?:www\.)?instagram\.com/(?:p|reel|tv)/([A-Za-z0-9_-]+)/?"
-)
-
-def extract_shortcode(url: str):
-    match = SHORTCODE_RE.search(url)
-    return match.group(1) if match else None
-
-# --- Escape function for MarkdownV2 ---
-def escape_markdown_v2(text: str) -> str:
-    escape_chars = r'\_*[]()~`>#+-=|{}.!'
-    return ''.join(f'\\{c}' if c in escape_chars else c for c in text)
-
-# --- /start command ---
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if update.effective_user.id != ALLOWED_USER_ID:
-        logger.warning(f"Unauthorized user {update.effective_user.id} tried to use /start.")
-        return
-    await update.message.reply_text(
-        "Hello! Send me a public Instagram post or reel URL, and I will repost it to the target channel."
-    )
-
-# --- Handle incoming messages ---
-async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = update.effective_user
-    if not update.message:
-        return
-    text = (update.message.text or "").strip()
-
-    if user.id != ALLOWED_USER_ID:
-        logger.warning(f"Ignoring message from unauthorized user {user.id} ({user.username}).")
-        return
-
-    shortcode = extract_shortcode(text)
-    if not shortcode:
-        await update.message.reply_text(
-            "That doesn't look like a valid Instagram post/reel URL. "
-            "Please send a link like `https://instagram.com/p/SHORTCODE`",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        return
-
-    url = f"https://www.instagram.com/p/{shortcode}/"
-    processing_message = await update.message.reply_text("🔗 Got it. Starting download...")
-
-    temp_dir = Path(f"./temp_download_{shortcode}")
-    temp_dir.mkdir(exist_ok=True)
-
-    try:
-        video_path_template = temp_dir / f"{shortcode}.%(ext)s"
-
-        # Run yt-dlp
-        cmd = [
-            "yt-dlp",
-            "--no-check-certificate",
-            "--write-info-json",
-            "-f", "best[ext=mp4][height<=720]/best",
-            "--merge-output-format", "mp4",
-            "--remux-video", "mp4",
-            "-o", str(video_path_template),
-            url,
-        ]
-        logger.info(f"Running yt-dlp: {' '.join(cmd)}")
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await process.communicate()
-        if process.returncode != 0:
-            error_message = stderr.decode('utf-8', errors='ignore').strip()
-            logger.error(f"yt-dlp failed: {error_message}")
-            await processing_message.edit_text(f"❌ Download failed.\n\nError: `{error_message}`")
-            return
-
-        # Find files
-        info_json_path = next(temp_dir.glob("*.info.json"), None)
-        video_path = next(temp_dir.glob("*.mp4"), None)
-        if not video_path or not info_json_path:
-            logger.error("Could not find downloaded video or JSON.")
-            await processing_message.edit_text("❌ Download failed: Could not find media files.")
-            return
-
-        # File size check
-        if video_path.stat().st_size > MAX_FILE_SIZE_BYTES:
-            await processing_message.edit_text(
-                f"❌ Video too large ({video_path.stat().st_size / 1e6:.2f} MB). Telegram limit is {MAX_FILE_SIZE_MB} MB."
-            )
-            return
-
-        await processing_message.edit_text("✅ Download complete. Preparing to post...")
-
-        # Load metadata
-        with open(info_json_path, 'r', encoding='utf-8') as f:
-            info = json.load(f)
-
-        # Instagram username of the creator
-        username = info.get("uploader", "unknown")  # THIS IS THE KEY CHANGE
-        description = info.get("description", "")
-        post_url = info.get("webpage_url", url)
-
-        # Escape for MarkdownV2
-        escaped_username = escape_markdown_v2(username)
-        escaped_description = escape_markdown_v2(description)
-
-        # Build caption: credit -> link -> description
-        caption = f"🎥 Credit: [@{escaped_username}](https://instagram.com/{escaped_username})\n"
-        caption += f"🔗 Reel: [Click here]({post_url})\n"
-        caption += f"{escaped_description}"
-
-        # Truncate if too long
-        if len(caption) > TELEGRAM_CAPTION_LIMIT:
-            caption = caption[:TELEGRAM_CAPTION_LIMIT - 4] + "..."
-
-        # Send video
-        await context.bot.send_video(
-            chat_id=TARGET_CHANNEL_ID,
-            video=video_path.read_bytes(),
-            caption=caption,
-            parse_mode=ParseMode.MARKDOWN_V2
-        )
-        await processing_message.edit_text("✅ Successfully posted to your channel!")
-        logger.info(f"Posted video for {shortcode} successfully.")
-
-    except TelegramError as e:
-        logger.error(f"Telegram error: {e}")
-        await processing_message.edit_text(f"❌ Telegram error: {e.message}")
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}", exc_info=True)
-        await processing_message.edit_text(f"❌ Unexpected error: {e}")
-    finally:
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        logger.info(f"🧹 Cleaned up temp files for {shortcode}")
-
-# --- Error handler ---
-async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
-    logger.error("Exception while handling an update:", exc_info=context.error)
-
-# --- Main ---
-def main():
-    if not all([BOT_TOKEN, TARGET_CHANNEL_ID, ALLOWED_USER_ID]):
-        raise ValueError("Environment variables BOT_TOKEN, TARGET_CHANNEL_ID, ALLOWED_USER_ID not set.")
-
-    app = (
-        ApplicationBuilder()
-        .token(BOT_TOKEN)
-        .connect_timeout(30.0)
-        .read_timeout(30.0)
-        .build()
-    )
-
-    app.add_handler(CommandHandler("start", start_command))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-    app.add_error_handler(error_handler)
-
-    logger.info("🤖 Bot is starting...")
-    app.run_polling()
-
-if __name__ == "__main__":
-    main()
+import os
+import json
+import uuid
+import atexit
+import shelve
+import shutil
+import tempfile
+import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+import asyncio
+import logging
+from dataclasses import dataclass
+from functools import cache, lru_cache
+from pathlib import Path
+import httpx
+import yt_dlp
+from telegram import InputFile, Update
+from telegram.constants import ParseMode
+from telegram.ext import ApplicationBuilder, ContextTypes, MessageHandler, filters, CommandHandler
+from telegram.error import TelegramError
+
+# ============================ CONFIGURATION ============================
+TELEGRAM_CAPTION_LIMIT = 1024
+MAX_FILE_SIZE_MB = 50
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Runtime configuration, read from the environment exactly once.
+
+    slots=True makes each attribute access a C-level slot load instead of
+    an instance-dict lookup on the hot path.
+    """
+
+    bot_token: str | None
+    target_channel_id: str | None
+    allowed_user_id: int | None
+    caption_limit: int
+    max_file_size_bytes: int
+
+@cache
+def load_config() -> Config:
+    try:
+        allowed_user_id = int(os.getenv("ALLOWED_USER_ID"))
+    except (ValueError, TypeError):
+        allowed_user_id = None
+    return Config(
+        bot_token=os.getenv("BOT_TOKEN"),
+        target_channel_id=os.getenv("TARGET_CHANNEL_ID"),
+        allowed_user_id=allowed_user_id,
+        caption_limit=TELEGRAM_CAPTION_LIMIT,
+        max_file_size_bytes=MAX_FILE_SIZE_MB * 1024 * 1024,
+    )
+
+CFG = load_config()
+# =======================================================================
+
+# --- Logging ---
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("telegram.ext").setLevel(logging.WARNING)
+
+# --- Instagram shortcode extraction (plain string ops, no regex) ---
+_SHORTCODE_SEPS = ("/p/", "/reel/", "/tv/")
+_SHORTCODE_CHARS = frozenset(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-"
+)
+
+@lru_cache(maxsize=256)
+def extract_shortcodes(text: str):
+    """Return all Instagram shortcodes in the text, deduplicated, in order."""
+    codes = []
+    pos = 0
+    n = len(text)
+    while True:
+        # Anchor on the host literal; a message without it costs one find()
+        idx = text.find("instagram.com", pos)
+        if idx < 0:
+            break
+        pos = idx + len("instagram.com")
+        for sep in _SHORTCODE_SEPS:
+            if text.startswith(sep, pos):
+                start = pos + len(sep)
+                end = start
+                while end < n and text[end] in _SHORTCODE_CHARS:
+                    end += 1
+                if end > start:
+                    codes.append(text[start:end])
+                pos = end
+                break
+    return tuple(dict.fromkeys(codes))
+
+def extract_shortcode(url: str):
+    codes = extract_shortcodes(url)
+    return codes[0] if codes else None
+
+# --- Direct Instagram fetch (fast path, no yt-dlp subprocess) ---
+IG_MEDIA_URL = "https://www.instagram.com/p/{}/?__a=1&__d=dis"
+IG_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+class VideoTooLargeError(Exception):
+    """Raised when the CDN-reported size exceeds the Telegram upload limit."""
+
+    def __init__(self, size: int):
+        # Size 0 means no usable figure was reported; "0.00 MB" would make
+        # the user-facing status nonsense, so fall back to the limit itself
+        super().__init__(f"{size / 1e6:.2f} MB" if size else f"over {MAX_FILE_SIZE_MB} MB")
+        self.size = size
+
+async def fetch_direct(client: httpx.AsyncClient, shortcode: str, dest: Path):
+    """Fetch a post's video straight from Instagram's JSON endpoint.
+
+    Writes the video to ``dest``. Returns (info, video_path) on success,
+    (None, None) on any failure so the caller can fall back to yt-dlp.
+    Raises VideoTooLargeError without downloading when the CDN reports a
+    size over the upload limit.
+    """
+    try:
+        r = await client.get(IG_MEDIA_URL.format(shortcode))
+        r.raise_for_status()
+        # orjson parses in native code, ~3-5x faster than stdlib json
+        data = orjson.loads(r.content) if orjson else json.loads(r.content)
+        media = data.get("graphql", {}).get("shortcode_media") or (data.get("items") or [{}])[0]
+        video_url = media.get("video_url")
+        if not video_url:
+            return None, None
+
+        owner = media.get("owner") or media.get("user") or {}
+        caption_edges = media.get("edge_media_to_caption", {}).get("edges", [])
+        if caption_edges:
+            description = caption_edges[0].get("node", {}).get("text", "")
+        else:
+            description = (media.get("caption") or {}).get("text", "")
+        info = {
+            "uploader": owner.get("username", "unknown"),
+            "description": description,
+            "webpage_url": f"https://www.instagram.com/p/{shortcode}/",
+        }
+
+        async with client.stream("GET", video_url) as resp:
+            resp.raise_for_status()
+            # Reject oversized media before transferring a single byte
+            content_length = int(resp.headers.get("Content-Length") or 0)
+            if content_length > CFG.max_file_size_bytes:
+                raise VideoTooLargeError(content_length)
+            f = await asyncio.to_thread(open, dest, "wb")
+            try:
+                async for chunk in resp.aiter_bytes(1 << 16):
+                    await asyncio.to_thread(f.write, chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+        return info, dest
+    except VideoTooLargeError:
+        raise
+    except Exception as e:
+        logger.info("Direct fetch failed for %s, falling back to yt-dlp: %s", shortcode, e)
+        await asyncio.to_thread(dest.unlink, missing_ok=True)
+        return None, None
+
+# --- Temp storage ---
+# One process-wide scratch dir reused by every request, so the per-request
+# mkdir/rmtree churn (two metadata syscalls plus flushes each) goes away;
+# jobs unlink just the file they produced and the whole dir is removed at
+# exit.
+TMP_ROOT = Path(tempfile.mkdtemp(prefix="igbot-"))
+atexit.register(shutil.rmtree, TMP_ROOT, ignore_errors=True)
+
+# --- Telegram file_id cache ---
+class FileIdCache:
+    """Persistent shortcode -> (file_id, caption) cache backed by shelve.
+
+    Telegram lets a bot resend any file it already uploaded by file_id,
+    so a repeat of an already-posted shortcode becomes one API call
+    instead of a fresh download plus a multi-MB upload. Bounded by
+    evicting an arbitrary entry once full (shelve keeps no order).
+
+    Calls come from threadpool workers (one per concurrent download) and
+    shelve is not thread-safe, so every operation — including the lazy
+    open — runs under one lock.
+    """
+
+    def __init__(self, path: str = "file_id_cache.db", max_entries: int = 512):
+        self._path = path
+        self._max = max_entries
+        self._db = None
+        self._db_lock = threading.Lock()
+
+    def _get_db(self):
+        # Caller must hold _db_lock
+        if self._db is None:
+            self._db = shelve.open(self._path)
+        return self._db
+
+    def get(self, shortcode: str):
+        with self._db_lock:
+            return self._get_db().get(shortcode)
+
+    def put(self, shortcode: str, file_id: str, caption: str):
+        with self._db_lock:
+            db = self._get_db()
+            if shortcode not in db and len(db) >= self._max:
+                del db[next(iter(db))]
+            db[shortcode] = (file_id, caption)
+            db.sync()
+
+FILE_ID_CACHE = FileIdCache()
+
+# --- Persistent yt-dlp worker ---
+# Single canonical option set, built once at import; per-request code only
+# supplies the URL.
+YTDLP_OPTS = {
+    # Reels are almost always H.264/AAC mp4 already; selecting mp4 streams
+    # directly means no ffmpeg remux pass (one less process, half the disk
+    # writes) on the common path. The filesize<? filters steer selection
+    # under the Telegram limit up front (?: streams with unknown size still
+    # pass), and max_filesize aborts instead of downloading something the
+    # bot would refuse to upload anyway.
+    "format": (
+        "bv*[ext=mp4][height<=720][filesize<?30M]+ba[ext=m4a][filesize<?20M]"
+        "/b[ext=mp4][height<=720][filesize<?50M]"
+    ),
+    "max_filesize": MAX_FILE_SIZE_MB * 1024 * 1024,
+    "merge_output_format": "mp4",
+    "outtmpl": str(TMP_ROOT / "%(id)s.%(ext)s"),
+    "noprogress": True,
+    "quiet": True,
+    "no_warnings": True,
+}
+
+# Permissive retry for the rare post with no mp4 formats; ffmpeg remuxes
+# whatever we get into an mp4 container
+YTDLP_FALLBACK_OPTS = {
+    **YTDLP_OPTS,
+    "format": "best[height<=720][filesize<?50M]/best[filesize<?50M]",
+    "postprocessors": [{"key": "FFmpegVideoRemuxer", "preferedformat": "mp4"}],
+}
+
+class YtDlpWorker:
+    """Resident in-process yt-dlp downloader.
+
+    A fresh yt-dlp subprocess pays hundreds of ms of interpreter startup
+    and extractor imports per request, and its --batch-file mode reads
+    stdin to EOF before downloading anything, so a stdin-fed daemon
+    cannot hand back results per URL. Importing yt_dlp once and reusing
+    a single YoutubeDL instance gives the same amortization without the
+    fork/exec. The blocking download runs in a thread; a lock serializes
+    access because YoutubeDL instances are not thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._ydl = None
+        self._ydl_fallback = None
+
+    def prewarm(self):
+        """Build the YoutubeDL instance so the first request doesn't pay for it."""
+        if self._ydl is None:
+            self._ydl = yt_dlp.YoutubeDL(dict(YTDLP_OPTS))
+
+    def _download_sync(self, url: str, dest: Path):
+        self.prewarm()
+        try:
+            info = self._ydl.extract_info(url, download=True)
+        except yt_dlp.utils.DownloadError:
+            if self._ydl_fallback is None:
+                self._ydl_fallback = yt_dlp.YoutubeDL(dict(YTDLP_FALLBACK_OPTS))
+            info = self._ydl_fallback.extract_info(url, download=True)
+        requested = info.get("requested_downloads") or []
+        filepath = requested[0].get("filepath") if requested else None
+        if not filepath:
+            # A max_filesize hit makes yt-dlp skip the transfer without
+            # raising, leaving no filepath behind; surface it as the same
+            # oversize rejection the direct-fetch path uses
+            size = requested[0].get("filesize") if requested else None
+            size = size or info.get("filesize") or info.get("filesize_approx") or 0
+            raise VideoTooLargeError(size)
+        # The shared outtmpl means two jobs for the same shortcode resolve
+        # to the same filename, letting one job's cleanup unlink the other's
+        # upload. Moving the result onto the caller's per-job path while the
+        # lock is still held leaves nothing at the shared name to fight over.
+        return Path(filepath).replace(dest), info
+
+    async def download(self, url: str, dest: Path, timeout: float = 300.0):
+        """Download one URL into the caller's per-job path.
+
+        Returns (filepath, info, None) on success or (None, None,
+        error_text) on failure. VideoTooLargeError propagates so the
+        caller can report the size limit.
+        """
+        async with self._lock:
+            try:
+                filepath, info = await asyncio.wait_for(
+                    asyncio.to_thread(self._download_sync, url, dest), timeout
+                )
+                return filepath, info, None
+            except asyncio.TimeoutError:
+                return None, None, "yt-dlp timed out"
+            except VideoTooLargeError:
+                raise
+            except Exception as e:
+                return None, None, str(e)
+
+YTDLP_WORKER = YtDlpWorker()
+
+# --- yt-dlp fallback download ---
+async def download_with_ytdlp(url: str, shortcode: str, status, dest: Path):
+    """Download via the persistent yt-dlp worker into ``dest``.
+
+    Returns (video_path, info) on success; on failure sets the status
+    message to the error and returns (None, None). The metadata comes
+    straight from extract_info — no info.json is written to disk or
+    parsed back.
+    """
+    logger.info("Queueing %s to the yt-dlp worker", shortcode)
+    filepath, info, error_message = await YTDLP_WORKER.download(url, dest)
+    if filepath is None:
+        logger.error("yt-dlp failed: %s", error_message)
+        await status.set(f"❌ Download failed.\n\nError: `{error_message}`")
+        return None, None
+
+    video_path = Path(filepath)
+    if not video_path.exists():
+        logger.error("Could not find downloaded video.")
+        await status.set("❌ Download failed: Could not find media files.")
+        return None, None
+    return video_path, info
+
+# --- Debounced status edits ---
+class StatusUpdater:
+    """Coalesces rapid status edits into fewer Telegram API calls.
+
+    Every edit_text is a full HTTPS round-trip (~100-300 ms) on the
+    critical path. Transitions that arrive faster than the debounce
+    window are held back and overwritten by the next one; flush()
+    guarantees the final text always lands.
+    """
+
+    def __init__(self, message, min_interval: float = 0.5):
+        self._message = message
+        self._min_interval = min_interval
+        self._pending = None
+        self._sent = message.text
+        self._last = 0.0
+
+    async def set(self, text: str):
+        self._pending = text
+        now = asyncio.get_running_loop().time()
+        if now - self._last >= self._min_interval:
+            await self.flush()
+
+    async def flush(self):
+        if self._pending is None or self._pending == self._sent:
+            return
+        text = self._pending
+        self._pending = None
+        self._sent = text
+        self._last = asyncio.get_running_loop().time()
+        await self._message.edit_text(text)
+
+# --- Escape function for MarkdownV2 ---
+_MD2_TABLE = str.maketrans({c: f'\\{c}' for c in r'\_*[]()~`>#+-=|{}.!'})
+
+def escape_markdown_v2(text: str) -> str:
+    return text.translate(_MD2_TABLE)
+
+# --- /start command ---
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(
+        "Hello! Send me a public Instagram post or reel URL, and I will repost it to the target channel."
+    )
+
+# --- Per-shortcode download/post pipeline ---
+# Process-wide bound on concurrent downloads: overlaps one link's download
+# with another's upload while capping disk usage and Telegram rate pressure,
+# no matter how many messages arrive at once.
+DOWNLOAD_SEM = asyncio.BoundedSemaphore(4)
+
+# The hot-path constants are bound as default args so each reference is a
+# LOAD_FAST instead of a module-dict lookup.
+async def _process_one(
+    shortcode: str,
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    _target_channel_id=CFG.target_channel_id,
+    _caption_limit=CFG.caption_limit,
+    _max_file_size_bytes=CFG.max_file_size_bytes,
+):
+    url = f"https://www.instagram.com/p/{shortcode}/"
+
+    # Cache hit: resend by file_id — one API call, no download, no upload.
+    # A broken cache db must not swallow the link, so treat it as a miss.
+    try:
+        cached = await asyncio.to_thread(FILE_ID_CACHE.get, shortcode)
+    except Exception as e:
+        logger.error("file_id cache read failed for %s: %s", shortcode, e)
+        cached = None
+    if cached is not None:
+        file_id, caption = cached
+        try:
+            await context.bot.send_video(
+                chat_id=_target_channel_id,
+                video=file_id,
+                caption=caption,
+                parse_mode=ParseMode.MARKDOWN_V2
+            )
+        except TelegramError:
+            logger.info("Cached file_id for %s rejected; re-downloading.", shortcode)
+        else:
+            await update.message.reply_text("✅ Successfully posted to your channel!")
+            logger.info("Posted %s from the file_id cache.", shortcode)
+            return
+
+    processing_message = await update.message.reply_text("🔗 Got it. Starting download...")
+    status = StatusUpdater(processing_message)
+
+    # uuid suffix so concurrent jobs never collide: the direct fetch writes
+    # here and the yt-dlp worker moves its output here under its lock
+    dest = TMP_ROOT / f"{shortcode}_{uuid.uuid4().hex[:8]}.mp4"
+    video_path = None
+
+    try:
+        # Fast path: hit Instagram's JSON endpoint over the shared httpx pool,
+        # skipping yt-dlp's per-request interpreter startup entirely.
+        info = None
+        client = context.application.bot_data.get("http")
+        if client is not None:
+            info, video_path = await fetch_direct(client, shortcode, dest)
+
+        if video_path is None:
+            video_path, info = await download_with_ytdlp(url, shortcode, status, dest)
+            if video_path is None:
+                return
+
+        # File size check
+        video_size = (await asyncio.to_thread(video_path.stat)).st_size
+        if video_size > _max_file_size_bytes:
+            await status.set(
+                f"❌ Video too large ({video_size / 1e6:.2f} MB). Telegram limit is {MAX_FILE_SIZE_MB} MB."
+            )
+            return
+
+        # Instagram username of the creator
+        username = info.get("uploader", "unknown")  # THIS IS THE KEY CHANGE
+        description = info.get("description", "")
+        post_url = info.get("webpage_url", url)
+
+        # Escape for MarkdownV2
+        escaped_username = escape_markdown_v2(username)
+
+        # Build caption: credit -> link -> description. The header fixes the
+        # remaining budget, so trim the raw description to it first and keep
+        # the escape off text that would be truncated away anyway (escaping
+        # can inflate length, hence the final check stays as a safety net)
+        header = (
+            f"🎥 Credit: [@{escaped_username}](https://instagram.com/{escaped_username})\n"
+            f"🔗 Reel: [Click here]({post_url})\n"
+        )
+        budget = _caption_limit - len(header)
+        if len(description) > budget:
+            description = description[:budget]
+        caption = header + escape_markdown_v2(description)
+
+        # Truncate if too long
+        if len(caption) > _caption_limit:
+            caption = caption[:_caption_limit - 4] + "..."
+
+        # Send video with read_file_handle=False so the handle goes straight to
+        # httpx, which streams the multipart body from the page cache in chunks
+        # instead of staging the whole file in a bytes object first
+        with open(video_path, "rb") as video_file:
+            sent_message = await context.bot.send_video(
+                chat_id=_target_channel_id,
+                video=InputFile(video_file, filename=video_path.name, read_file_handle=False),
+                caption=caption,
+                parse_mode=ParseMode.MARKDOWN_V2
+            )
+        if sent_message.video:
+            # put() ends in a shelve sync, which can hit the disk. The post
+            # already succeeded, so a cache failure only gets logged — it
+            # must not flip the status to an error.
+            try:
+                await asyncio.to_thread(
+                    FILE_ID_CACHE.put, shortcode, sent_message.video.file_id, caption
+                )
+            except Exception as e:
+                logger.error("file_id cache write failed for %s: %s", shortcode, e)
+        await status.set("✅ Successfully posted to your channel!")
+        logger.info("Posted video for %s successfully.", shortcode)
+
+    except VideoTooLargeError as e:
+        # Raised pre-transfer by either acquisition path
+        await status.set(
+            f"❌ Video too large ({e}). Telegram limit is {MAX_FILE_SIZE_MB} MB."
+        )
+    except TelegramError as e:
+        logger.error("Telegram error: %s", e)
+        await status.set(f"❌ Telegram error: {e.message}")
+    except Exception as e:
+        logger.error("Unexpected error: %s", e, exc_info=True)
+        await status.set(f"❌ Unexpected error: {e}")
+    finally:
+        # Make sure the last status edit lands even if it was debounced away
+        await status.flush()
+        # Only the file this job produced needs removing; TMP_ROOT persists
+        if video_path is not None:
+            await asyncio.to_thread(video_path.unlink, missing_ok=True)
+        logger.info("🧹 Cleaned up temp files for %s", shortcode)
+
+# --- Handle incoming messages ---
+async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not update.message:
+        return
+    # No strip()/fallback allocation: the extractor anchors on the host
+    # literal and tolerates surrounding whitespace on its own
+    text = update.message.text
+    if not text:
+        return
+
+    shortcodes = extract_shortcodes(text)
+    if not shortcodes:
+        await update.message.reply_text(
+            "That doesn't look like a valid Instagram post/reel URL. "
+            "Please send a link like `https://instagram.com/p/SHORTCODE`",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+
+    async def bounded(code):
+        async with DOWNLOAD_SEM:
+            await _process_one(code, update, context)
+
+    await asyncio.gather(*(bounded(code) for code in shortcodes))
+
+# --- Error handler ---
+async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
+    logger.error("Exception while handling an update:", exc_info=context.error)
+
+# --- Main ---
+def main():
+    if not all([CFG.bot_token, CFG.target_channel_id, CFG.allowed_user_id]):
+        raise ValueError("Environment variables BOT_TOKEN, TARGET_CHANNEL_ID, ALLOWED_USER_ID not set.")
+
+    # One shared httpx client so Instagram fetches reuse pooled keepalive
+    # connections (no TLS handshake after warmup) and can multiplex over HTTP/2
+    http_client = httpx.AsyncClient(
+        headers={"User-Agent": IG_USER_AGENT},
+        timeout=30.0,
+        follow_redirects=True,
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=30),
+    )
+
+    async def close_http_client(_app):
+        await http_client.aclose()
+
+    async def prewarm_ytdlp(_app):
+        await asyncio.to_thread(YTDLP_WORKER.prewarm)
+
+    # A message costs 3-4 Bot API calls (reply, edits, send_video); a sized
+    # keepalive pool plus HTTP/2 lets them share one warm TLS connection
+    app = (
+        ApplicationBuilder()
+        .token(CFG.bot_token)
+        .connect_timeout(30.0)
+        .read_timeout(30.0)
+        .connection_pool_size(16)
+        .pool_timeout(5.0)
+        .get_updates_connection_pool_size(8)
+        .http_version("2")
+        .post_init(prewarm_ytdlp)
+        .post_shutdown(close_http_client)
+        .build()
+    )
+    app.bot_data["http"] = http_client
+
+    # Drop foreign updates in the dispatcher's filter check instead of
+    # scheduling a coroutine that immediately returns
+    allowed_user = filters.User(user_id=CFG.allowed_user_id)
+    app.add_handler(CommandHandler("start", start_command, filters=allowed_user))
+    app.add_handler(
+        MessageHandler(filters.TEXT & ~filters.COMMAND & allowed_user, handle_message)
+    )
+    app.add_error_handler(error_handler)
+
+    logger.info("🤖 Bot is starting...")
+    app.run_polling()
+
+if __name__ == "__main__":
+    main()